@@ -1,12 +1,80 @@
+import functools
 import math
 
+import numpy as np
 import pygame
 
-from sprites import blit_tiled
+from physics import any_overlap, overlaps, step_enemies
+from sprites import POSE_IDLE, POSE_JUMP, POSE_WALK, Sprites, blit_tiled
 
 
 SCREEN_WIDTH = 960
 SCREEN_HEIGHT = 540
+SKY_COLOR = (120, 190, 255)
+GRID_CELL = 128
+# Positions are stored as integers in 1/256 pixel units.
+SUBPIXEL_BITS = 8
+SUBPIXEL_SCALE = 1 << SUBPIXEL_BITS
+
+# Mushroom bob offsets over one period of sin(t / 220ms), indexed by phase.
+_BOB_LUT = tuple(int(math.sin(2 * math.pi * i / 256) * 2) for i in range(256))
+_BOB_LUT_SCALE = 256 / (2 * math.pi * 220.0)
+
+
+def _to_pixels(q):
+    # Truncate toward zero, as int() did on the old float positions.
+    return q >> SUBPIXEL_BITS if q >= 0 else -(-q >> SUBPIXEL_BITS)
+
+
+def _overlaps(rect, xywh):
+    return overlaps(rect.x, rect.y, rect.w, rect.h, xywh)
+
+
+def _any_overlap(rect, xywh):
+    return any_overlap(rect.x, rect.y, rect.w, rect.h, xywh)
+
+
+def _in_view(xywh, x0, x1):
+    return (xywh[:, 0] + xywh[:, 2] >= x0) & (xywh[:, 0] <= x1)
+
+
+def _grid_keys(rect):
+    x0 = rect.left // GRID_CELL
+    x1 = (rect.right - 1) // GRID_CELL
+    y0 = rect.top // GRID_CELL
+    y1 = (rect.bottom - 1) // GRID_CELL
+    for cy in range(y0, y1 + 1):
+        for cx in range(x0, x1 + 1):
+            yield cx | (cy << 16)
+
+
+@functools.lru_cache(maxsize=None)
+def _baked_world(tile, solids, world_width, has_display):
+    # The level never changes, so restarts replay the background baked first.
+    # has_display is part of the key so a bake made before set_mode() is not
+    # reused unconverted once a display exists.
+    surface = pygame.Surface((world_width, SCREEN_HEIGHT))
+    surface.fill(SKY_COLOR)
+    for solid in solids:
+        rect = pygame.Rect(solid)
+        if tile is not None:
+            blit_tiled(surface, tile, rect)
+        else:
+            pygame.draw.rect(surface, (105, 70, 30), rect)
+    return surface.convert() if has_display else surface
+
+
+class Player:
+    __slots__ = ("xq", "yq", "w", "h", "vx", "vy", "on_ground")
+
+    def __init__(self, x, y, w, h):
+        self.xq = x << SUBPIXEL_BITS
+        self.yq = y << SUBPIXEL_BITS
+        self.w = w
+        self.h = h
+        self.vx = 0.0
+        self.vy = 0.0
+        self.on_ground = False
 
 
 class Game:
@@ -30,11 +98,12 @@ class Game:
             "jump_speed": 920.0,
             "stomp_bounce": 720.0,
             "enemy_speed": 140.0,
+            "enemy_active_margin": 200.0,
         }
 
         self.tile_size = 40
         self.world_width = 4800
-        self.camera_x = 0.0
+        self.camera_x = 0
 
         self.solids = []
         ground_y = SCREEN_HEIGHT - 80
@@ -61,68 +130,101 @@ class Game:
             ]
         )
 
-        self._coin_rects = []
-        for x, y in [
-            (560, 300),
-            (620, 300),
-            (680, 300),
-            (1020, 240),
-            (1080, 240),
-            (1940, 280),
-            (2000, 280),
-            (2280, 220),
-            (3140, 280),
-            (3200, 280),
-            (4180, 260),
-            (4240, 260),
-        ]:
-            self._coin_rects.append(pygame.Rect(int(x), int(y), 18, 18))
-
-        self._mushroom_rects = []
-        for x, y in [
-            (640, 318),
-            (1980, 298),
-        ]:
-            self._mushroom_rects.append(pygame.Rect(int(x), int(y), 22, 22))
+        # Solids never move: sort them by x, bucket them into a uniform grid
+        # and bake them into the background once.
+        self.solids.sort(key=lambda solid: solid.x)
+        self._solids_xywh = np.array(
+            [(solid.x, solid.y, solid.w, solid.h) for solid in self.solids], dtype=np.int32
+        ).reshape(-1, 4)
+        # Each cell holds its candidate solids in list order.
+        self._grid = {}
+        for solid in self.solids:
+            for key in _grid_keys(solid):
+                self._grid.setdefault(key, []).append(solid)
+        # Merged candidates for rects spanning several cells, keyed by cell range.
+        self._grid_spans = {}
+        self._world_surface = self._render_world()
+
+        self._coin_xywh = np.array(
+            [
+                (x, y, 18, 18)
+                for x, y in [
+                    (560, 300),
+                    (620, 300),
+                    (680, 300),
+                    (1020, 240),
+                    (1080, 240),
+                    (1940, 280),
+                    (2000, 280),
+                    (2280, 220),
+                    (3140, 280),
+                    (3200, 280),
+                    (4180, 260),
+                    (4240, 260),
+                ]
+            ],
+            dtype=np.int32,
+        ).reshape(-1, 4)
+
+        self._mushroom_xywh = np.array(
+            [
+                (x, y, 22, 22)
+                for x, y in [
+                    (640, 318),
+                    (1980, 298),
+                ]
+            ],
+            dtype=np.int32,
+        ).reshape(-1, 4)
 
         self.goal = pygame.Rect(self.world_width - 120, ground_y - 140, 20, 140)
 
         self.spawn = pygame.Vector2(120.0, float(ground_y - 28))
-        self.player = {
-            "x": float(self.spawn.x),
-            "y": float(self.spawn.y),
-            "w": 22.0,
-            "h": 28.0,
-            "vx": 0.0,
-            "vy": 0.0,
-            "on_ground": False,
-        }
+        self.player = Player(int(self.spawn.x), int(self.spawn.y), 22, 28)
         self._player_dir = 1
+        self._player_rect_cache = pygame.Rect(
+            _to_pixels(self.player.xq),
+            _to_pixels(self.player.yq),
+            self.player.w,
+            self.player.h,
+        )
 
-        self.chestnut_guys = []
-        for x in [760, 1760, 2920, 4060]:
-            self.chestnut_guys.append(
-                {
-                    "x": float(x),
-                    "y": float(ground_y - 20),
-                    "w": 24.0,
-                    "h": 20.0,
-                    "vx": -self._config["enemy_speed"],
-                    "vy": 0.0,
-                    "dir": -1.0,
-                    "alive": True,
-                }
-            )
+        enemy_xs = [760, 1760, 2920, 4060]
+        enemy_count = len(enemy_xs)
+        self._ex = np.array(enemy_xs, dtype=np.int64) << SUBPIXEL_BITS
+        self._ey = np.full(enemy_count, (ground_y - 20) << SUBPIXEL_BITS, dtype=np.int64)
+        # Pixel boxes, kept in sync with _ex/_ey in place by step_enemies.
+        self._enemy_xywh = np.array(
+            [(x, ground_y - 20, 24, 20) for x in enemy_xs], dtype=np.int32
+        ).reshape(-1, 4)
+        self._evx = np.full(enemy_count, -self._config["enemy_speed"])
+        self._evy = np.zeros(enemy_count)
+        self._edir = np.full(enemy_count, -1, dtype=np.int8)
+        self._ealive = np.ones(enemy_count, dtype=bool)
+        # One Rect per enemy, re-synced from _enemy_xywh by _enemy_rect.
+        self._enemy_rects = [pygame.Rect(box) for box in self._enemy_xywh.tolist()]
+
+        # Rendered text is reused until the values it shows change.
+        self._hud_cache_key = None
+        self._hud_surface = None
+        self._message_cache_key = None
+        self._message_surface = None
+
+        # Screen rects drawn last frame, restored from the background while the
+        # camera holds still.
+        self._drawn_camera_x = None
+        self._drawn_rects = []
+        # Scratch rect for the untextured fallback shapes.
+        self._tmp_rect = pygame.Rect(0, 0, 0, 0)
 
         self._last_time_s = pygame.time.get_ticks() / 1000.0
 
-    def update(self, action):
-        now = pygame.time.get_ticks() / 1000.0
-        dt = max(0.0, min(1 / 30, now - self._last_time_s))
-        self._last_time_s = now
+    def update(self, action, now_ticks):
+        now_s = now_ticks / 1000.0
+        dt = max(0.0, min(1 / 30, now_s - self._last_time_s))
+        self._last_time_s = now_s
 
         if self.state != "playing":
-            self._update_camera()
             return
 
         if self.invincible_s > 0.0:
@@ -137,129 +239,179 @@ class Game:
         self._check_fall_off_world()
         self._update_camera()
 
-    def draw(self, screen, fonts):
-        screen.fill((120, 190, 255))
+    def invalidate(self):
+        """Make the next draw repaint and return the whole screen."""
+        self._drawn_camera_x = None
 
-        camera_x = int(self.camera_x)
-        ticks = pygame.time.get_ticks()
+    def draw(self, screen, fonts, now_ticks):
+        """Draw the frame and return the screen rects that changed."""
+        camera_x = self.camera_x
+        view_x0 = camera_x
+        view_x1 = camera_x + SCREEN_WIDTH
 
-        if self.sprites:
-            for rect in self.solids:
-                draw_rect = pygame.Rect(rect.x - camera_x, rect.y, rect.w, rect.h)
-                blit_tiled(screen, self.sprites.ground_tile, draw_rect)
+        full_redraw = camera_x != self._drawn_camera_x
+        if full_redraw:
+            screen.blit(self._world_surface, (0, 0), (camera_x, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
+            dirty = [screen.get_rect()]
         else:
-            for rect in self.solids:
-                pygame.draw.rect(
-                    screen,
-                    (105, 70, 30),
-                    pygame.Rect(rect.x - camera_x, rect.y, rect.w, rect.h),
-                )
+            dirty = self._drawn_rects
+            for rect in dirty:
+                screen.blit(self._world_surface, rect, (rect.x + camera_x, rect.y, rect.w, rect.h))
+        drawn = []
+        tmp = self._tmp_rect
+
+        coins = self._coin_xywh[_in_view(self._coin_xywh, view_x0, view_x1)].tolist()
+        mushrooms = self._mushroom_xywh[_in_view(self._mushroom_xywh, view_x0, view_x1)].tolist()
 
         if self.sprites:
-            coin_frame = self.sprites.coin_frames[(ticks // 120) % len(self.sprites.coin_frames)]
-            for rect in self._coin_rects:
-                screen.blit(coin_frame, (rect.x - camera_x, rect.y))
+            coin_frames = self.sprites.coin_frames
+            coin_frame = coin_frames[(now_ticks // 120) % len(coin_frames)]
+            drawn.extend(screen.blits([(coin_frame, (x - camera_x, y)) for x, y, _, _ in coins]))
         else:
-            for rect in self._coin_rects:
-                pygame.draw.ellipse(
-                    screen,
-                    (250, 215, 70),
-                    pygame.Rect(rect.x - camera_x, rect.y, rect.w, rect.h),
-                )
-
-        if self._mushroom_rects:
+            for x, y, w, h in coins:
+                tmp.update(x - camera_x, y, w, h)
+                drawn.append(pygame.draw.ellipse(screen, (250, 215, 70), tmp))
+
+        if mushrooms:
             if self.sprites:
-                for rect in self._mushroom_rects:
-                    bob = int(math.sin((ticks + rect.x * 7) / 220.0) * 2)
-                    screen.blit(self.sprites.mushroom, (rect.x - camera_x, rect.y + bob))
+                batch = []
+                for x, y, _, _ in mushrooms:
+                    bob = _BOB_LUT[int((now_ticks + x * 7) * _BOB_LUT_SCALE) & 255]
+                    batch.append((self.sprites.mushroom, (x - camera_x, y + bob)))
+                drawn.extend(screen.blits(batch))
             else:
-                for rect in self._mushroom_rects:
-                    pygame.draw.rect(
-                        screen,
-                        (220, 50, 60),
-                        pygame.Rect(rect.x - camera_x, rect.y, rect.w, rect.h),
-                        border_radius=6,
-                    )
+                for x, y, w, h in mushrooms:
+                    tmp.update(x - camera_x, y, w, h)
+                    drawn.append(pygame.draw.rect(screen, (220, 50, 60), tmp, border_radius=6))
 
         if self.sprites:
-            screen.blit(self.sprites.goal, (self.goal.x - camera_x, self.goal.y))
+            drawn.append(screen.blit(self.sprites.goal, (self.goal.x - camera_x, self.goal.y)))
         else:
-            pygame.draw.rect(
-                screen,
-                (255, 255, 255),
-                pygame.Rect(self.goal.x - camera_x, self.goal.y, self.goal.w, self.goal.h),
-            )
+            tmp.update(self.goal.x - camera_x, self.goal.y, self.goal.w, self.goal.h)
+            drawn.append(pygame.draw.rect(screen, (255, 255, 255), tmp))
 
-        for enemy in self.chestnut_guys:
-            if not enemy["alive"]:
-                continue
-            rect = pygame.Rect(int(enemy["x"]), int(enemy["y"]), int(enemy["w"]), int(enemy["h"]))
-            rect.x -= camera_x
-            if self.sprites:
-                facing = "left" if enemy["dir"] < 0 else "right"
-                frame = self.sprites.enemy[(ticks // 180) % len(self.sprites.enemy)][facing]
-                screen.blit(frame, rect.topleft)
-            else:
-                pygame.draw.rect(screen, (150, 95, 45), rect, border_radius=6)
-                eye = pygame.Rect(rect.x + 6, rect.y + 6, 4, 4)
-                pygame.draw.rect(screen, (255, 255, 255), eye, border_radius=2)
-                eye.x += 10
-                pygame.draw.rect(screen, (255, 255, 255), eye, border_radius=2)
+        visible = np.flatnonzero(self._ealive & _in_view(self._enemy_xywh, view_x0, view_x1))
+        if self.sprites:
+            frames = self.sprites.enemy_frames
+            step = (now_ticks // 180) & 1
+            batch = []
+            for i in visible:
+                rect = self._enemy_rect(i)
+                sprite = frames[Sprites.enemy_index(int(self._edir[i] < 0), step)]
+                batch.append((sprite, (rect.x - camera_x, rect.y)))
+            drawn.extend(screen.blits(batch))
+        else:
+            for i in visible:
+                rect = self._enemy_rect(i)
+                x = rect.x - camera_x
+                tmp.update(x, rect.y, rect.w, rect.h)
+                drawn.append(pygame.draw.rect(screen, (150, 95, 45), tmp, border_radius=6))
+                tmp.update(x + 6, rect.y + 6, 4, 4)
+                pygame.draw.rect(screen, (255, 255, 255), tmp, border_radius=2)
+                tmp.x += 10
+                pygame.draw.rect(screen, (255, 255, 255), tmp, border_radius=2)
 
         player_rect = self._player_rect()
-        player_draw = pygame.Rect(
-            player_rect.x - camera_x, player_rect.y, player_rect.w, player_rect.h
-        )
+        player_x = player_rect.x - camera_x
         if self.sprites:
-            if self.invincible_s > 0.0 and (ticks // 90) % 2 == 0:
+            if self.invincible_s > 0.0 and (now_ticks // 90) % 2 == 0:
                 pass
             else:
-                form = "powered" if self.powered_up else "normal"
-                facing = "left" if self._player_dir < 0 else "right"
-                if not self.player["on_ground"]:
-                    sprite = self.sprites.player[form]["jump"][facing]
-                elif abs(self.player["vx"]) > 60:
-                    sprite = self.sprites.player[form]["walk"][(ticks // 120) % 2][facing]
+                if not self.player.on_ground:
+                    pose = POSE_JUMP
+                elif abs(self.player.vx) > 60:
+                    pose = POSE_WALK + (now_ticks // 120) % 2
                 else:
-                    sprite = self.sprites.player[form]["idle"][facing]
-                screen.blit(sprite, player_draw.topleft)
+                    pose = POSE_IDLE
+                index = Sprites.player_index(self.powered_up, self._player_dir < 0, pose)
+                sprite = self.sprites.player_frames[index]
+                drawn.append(screen.blit(sprite, (player_x, player_rect.y)))
         else:
             top_color = (65, 205, 95) if self.powered_up else (220, 50, 60)
-            if self.invincible_s > 0.0 and (ticks // 90) % 2 == 0:
+            if self.invincible_s > 0.0 and (now_ticks // 90) % 2 == 0:
                 pass
             else:
-                pygame.draw.rect(screen, top_color, player_draw, border_radius=6)
-                pygame.draw.rect(
-                    screen,
-                    (35, 70, 200),
-                    pygame.Rect(player_draw.x, player_draw.y + 14, player_draw.w, 14),
-                    border_radius=6,
-                )
-
-        status = []
-        if self.powered_up:
-            status.append("POWER")
-        if self.invincible_s > 0.0:
-            status.append("INV")
-        suffix = f"   {' '.join(status)}" if status else ""
-        hud = f"Score {self.score}   Coins {self.coins}   Lives {self.lives}{suffix}"
-        text = fonts["small"].render(hud, True, (0, 0, 0))
-        screen.blit(text, (14, 12))
-
-        if self.state == "win":
-            msg = fonts["large"].render("YOU WIN! Press R to restart.", True, (10, 10, 10))
-            screen.blit(msg, (SCREEN_WIDTH // 2 - msg.get_width() // 2, 120))
-        elif self.state == "gameover":
-            msg = fonts["large"].render("GAME OVER. Press R to restart.", True, (10, 10, 10))
-            screen.blit(msg, (SCREEN_WIDTH // 2 - msg.get_width() // 2, 120))
+                tmp.update(player_x, player_rect.y, player_rect.w, player_rect.h)
+                drawn.append(pygame.draw.rect(screen, top_color, tmp, border_radius=6))
+                tmp.update(player_x, player_rect.y + 14, player_rect.w, 14)
+                pygame.draw.rect(screen, (35, 70, 200), tmp, border_radius=6)
+
+        key = (
+            self.score,
+            self.coins,
+            self.lives,
+            self.powered_up,
+            self.invincible_s > 0.0,
+            self.state,
+        )
+        if key != self._hud_cache_key:
+            status = []
+            if self.powered_up:
+                status.append("POWER")
+            if self.invincible_s > 0.0:
+                status.append("INV")
+            suffix = f"   {' '.join(status)}" if status else ""
+            hud = f"Score {self.score}   Coins {self.coins}   Lives {self.lives}{suffix}"
+            self._hud_surface = fonts["small"].render(hud, True, (0, 0, 0))
+            self._hud_cache_key = key
+        drawn.append(screen.blit(self._hud_surface, (14, 12)))
+
+        if self.state != self._message_cache_key:
+            if self.state == "win":
+                msg = fonts["large"].render("YOU WIN! Press R to restart.", True, (10, 10, 10))
+            elif self.state == "gameover":
+                msg = fonts["large"].render("GAME OVER. Press R to restart.", True, (10, 10, 10))
+            else:
+                msg = None
+            self._message_surface = msg
+            self._message_cache_key = self.state
+        if self._message_surface:
+            msg = self._message_surface
+            drawn.append(screen.blit(msg, (SCREEN_WIDTH // 2 - msg.get_width() // 2, 120)))
+
+        self._drawn_camera_x = camera_x
+        self._drawn_rects = drawn
+        return dirty if full_redraw else dirty + drawn
+
+    def _render_world(self):
+        tile = self.sprites.ground_tile if self.sprites else None
+        return _baked_world(
+            tile,
+            tuple(tuple(solid) for solid in self.solids),
+            self.world_width,
+            pygame.display.get_surface() is not None,
+        )
 
     def _player_rect(self):
-        return pygame.Rect(
-            int(self.player["x"]),
-            int(self.player["y"]),
-            int(self.player["w"]),
-            int(self.player["h"]),
-        )
+        # Shared Rect re-synced on every call; copy it to keep a snapshot.
+        rect = self._player_rect_cache
+        rect.x = _to_pixels(self.player.xq)
+        rect.y = _to_pixels(self.player.yq)
+        return rect
+
+    def _enemy_rect(self, i):
+        rect = self._enemy_rects[i]
+        rect.x, rect.y = self._enemy_xywh[i, :2].tolist()
+        return rect
+
+    def _solids_near(self, rect):
+        # Keep list order so overlapping pushes resolve exactly like a full scan.
+        # The returned list is shared; callers must not modify it.
+        x0 = rect.left // GRID_CELL
+        x1 = (rect.right - 1) // GRID_CELL
+        y0 = rect.top // GRID_CELL
+        y1 = (rect.bottom - 1) // GRID_CELL
+        if x0 == x1 and y0 == y1:
+            return self._grid.get(x0 | (y0 << 16), ())
+        span = (x0, x1, y0, y1)
+        near = self._grid_spans.get(span)
+        if near is None:
+            wanted = set()
+            for key in _grid_keys(rect):
+                wanted.update(map(id, self._grid.get(key, ())))
+            near = [solid for solid in self.solids if id(solid) in wanted]
+            self._grid_spans[span] = near
+        return near
 
     def _play_sfx(self, name):
         sound = self.sfx.get(name)
@@ -270,7 +422,7 @@ class Game:
                 pass
 
     def _update_player(self, left, right, jump, dt):
-        prev_rect = self._player_rect()
+        prev_rect = self._player_rect().copy()
 
         accel = self._config["accel"]
         friction = self._config["friction"]
@@ -278,56 +430,59 @@ class Game:
 
         if left and not right:
             self._player_dir = -1
-            self.player["vx"] -= accel * dt
+            self.player.vx -= accel * dt
         elif right and not left:
             self._player_dir = 1
-            self.player["vx"] += accel * dt
+            self.player.vx += accel * dt
         else:
-            if self.player["vx"] > 0.0:
-                self.player["vx"] = max(0.0, self.player["vx"] - friction * dt)
-            elif self.player["vx"] < 0.0:
-                self.player["vx"] = min(0.0, self.player["vx"] + friction * dt)
+            if self.player.vx > 0.0:
+                self.player.vx = max(0.0, self.player.vx - friction * dt)
+            elif self.player.vx < 0.0:
+                self.player.vx = min(0.0, self.player.vx + friction * dt)
 
-        self.player["vx"] = max(-max_speed, min(max_speed, self.player["vx"]))
+        self.player.vx = max(-max_speed, min(max_speed, self.player.vx))
 
-        if jump and self.player["on_ground"]:
-            self.player["vy"] = -self._config["jump_speed"]
-            self.player["on_ground"] = False
+        if jump and self.player.on_ground:
+            self.player.vy = -self._config["jump_speed"]
+            self.player.on_ground = False
             self._play_sfx("jump")
 
-        self.player["vy"] = min(
+        self.player.vy = min(
             self._config["terminal_velocity"],
-            self.player["vy"] + self._config["gravity"] * dt,
+            self.player.vy + self._config["gravity"] * dt,
         )
 
-        self.player["x"] += self.player["vx"] * dt
+        self.player.xq += math.floor(self.player.vx * dt * SUBPIXEL_SCALE)
         rect = self._player_rect()
         rect = self._resolve_solids_axis(rect, axis="x")
-        self.player["x"] = float(rect.x)
+        self.player.xq = rect.x << SUBPIXEL_BITS
 
-        self.player["y"] += self.player["vy"] * dt
+        self.player.yq += math.floor(self.player.vy * dt * SUBPIXEL_SCALE)
         rect = self._player_rect()
-        self.player["on_ground"] = False
+        self.player.on_ground = False
         rect = self._resolve_solids_axis(rect, axis="y")
-        self.player["y"] = float(rect.y)
+        self.player.yq = rect.y << SUBPIXEL_BITS
 
-        if rect.y != int(self.player["y"]):
-            self.player["y"] = float(rect.y)
-
-        if rect.bottom == prev_rect.bottom and rect.y == prev_rect.y and not self.player["on_ground"]:
+        if rect.bottom == prev_rect.bottom and rect.y == prev_rect.y and not self.player.on_ground:
             pass
 
-        if rect.bottom >= prev_rect.bottom and self.player["vy"] >= 0.0:
+        # Landing in the y sweep already set on_ground; the probe only catches
+        # standing on a top edge without sinking a whole pixel into it.
+        if (
+            not self.player.on_ground
+            and rect.bottom >= prev_rect.bottom
+            and self.player.vy >= 0.0
+        ):
             if self._is_on_ground(rect):
-                self.player["on_ground"] = True
-                self.player["vy"] = 0.0
+                self.player.on_ground = True
+                self.player.vy = 0.0
 
-        self.player["x"] = max(0.0, min(float(self.world_width - rect.w), self.player["x"]))
+        self._clamp_player_x()
 
         self._check_enemy_collisions(prev_rect)
 
     def _resolve_solids_axis(self, rect, axis):
-        for solid in self.solids:
+        for solid in self._solids_near(rect):
             if not rect.colliderect(solid):
                 continue
             if axis == "x":
@@ -335,116 +490,81 @@ class Game:
                     rect.left = solid.right
                 else:
                     rect.right = solid.left
-                self.player["vx"] = 0.0
+                self.player.vx = 0.0
             else:
                 if rect.centery > solid.centery:
                     rect.top = solid.bottom
-                    self.player["vy"] = 0.0
+                    self.player.vy = 0.0
                 else:
                     rect.bottom = solid.top
-                    self.player["vy"] = 0.0
-                    self.player["on_ground"] = True
+                    self.player.vy = 0.0
+                    self.player.on_ground = True
         return rect
 
     def _is_on_ground(self, rect):
         probe = pygame.Rect(rect.x, rect.bottom + 1, rect.w, 2)
-        return any(probe.colliderect(solid) for solid in self.solids)
+        return probe.collidelist(self._solids_near(probe)) != -1
 
     def _collect_coins(self):
         player_rect = self._player_rect()
-        remaining = []
-        for coin in self._coin_rects:
-            if player_rect.colliderect(coin):
-                self.score += 200
-                self.coins += 1
-                self._play_sfx("coin")
-                if self.coins % 10 == 0:
-                    self.lives += 1
-            else:
-                remaining.append(coin)
-        self._coin_rects = remaining
+        if not _any_overlap(player_rect, self._coin_xywh):
+            return
+        hits = _overlaps(player_rect, self._coin_xywh)
+        collected = int(hits.sum())
+        self.score += 200 * collected
+        self.lives += (self.coins + collected) // 10 - self.coins // 10
+        self.coins += collected
+        self._play_sfx("coin")
+        self._coin_xywh = self._coin_xywh[~hits]
 
     def _collect_mushrooms(self):
         player_rect = self._player_rect()
-        remaining = []
-        for mushroom in self._mushroom_rects:
-            if player_rect.colliderect(mushroom):
-                if not self.powered_up:
-                    self.powered_up = True
-                    self.score += 1000
-                    self._play_sfx("powerup")
-                else:
-                    self.score += 250
-                    self._play_sfx("coin")
+        if not _any_overlap(player_rect, self._mushroom_xywh):
+            return
+        hits = _overlaps(player_rect, self._mushroom_xywh)
+        for _ in range(int(hits.sum())):
+            if not self.powered_up:
+                self.powered_up = True
+                self.score += 1000
+                self._play_sfx("powerup")
             else:
-                remaining.append(mushroom)
-        self._mushroom_rects = remaining
+                self.score += 250
+                self._play_sfx("coin")
+        self._mushroom_xywh = self._mushroom_xywh[~hits]
 
     def _update_enemies(self, dt):
-        for enemy in self.chestnut_guys:
-            if not enemy["alive"]:
-                continue
-
-            enemy["vy"] = min(
-                self._config["terminal_velocity"],
-                enemy["vy"] + self._config["gravity"] * dt,
-            )
-            enemy["vx"] = self._config["enemy_speed"] * enemy["dir"]
-
-            enemy["x"] += enemy["vx"] * dt
-            rect = pygame.Rect(int(enemy["x"]), int(enemy["y"]), int(enemy["w"]), int(enemy["h"]))
-            hit_wall = False
-            for solid in self.solids:
-                if rect.colliderect(solid):
-                    hit_wall = True
-                    if rect.centerx > solid.centerx:
-                        rect.left = solid.right
-                    else:
-                        rect.right = solid.left
-                    enemy["vx"] = 0.0
-            enemy["x"] = float(rect.x)
-
-            enemy["y"] += enemy["vy"] * dt
-            rect = pygame.Rect(int(enemy["x"]), int(enemy["y"]), int(enemy["w"]), int(enemy["h"]))
-            on_ground = False
-            for solid in self.solids:
-                if rect.colliderect(solid):
-                    if rect.centery > solid.centery:
-                        rect.top = solid.bottom
-                        enemy["vy"] = 0.0
-                    else:
-                        rect.bottom = solid.top
-                        enemy["vy"] = 0.0
-                        on_ground = True
-            enemy["y"] = float(rect.y)
-
-            if hit_wall:
-                enemy["dir"] *= -1.0
-
-            if on_ground:
-                foot_x = rect.right + 2 if enemy["dir"] > 0 else rect.left - 2
-                foot_probe = pygame.Rect(int(foot_x), rect.bottom + 2, 2, 6)
-                if not any(foot_probe.colliderect(solid) for solid in self.solids):
-                    enemy["dir"] *= -1.0
-
-            if enemy["y"] > SCREEN_HEIGHT + 400:
-                enemy["alive"] = False
+        # Enemies well outside the camera hold still until the player gets close.
+        margin = self._config["enemy_active_margin"]
+        step_enemies(
+            self._ex,
+            self._ey,
+            self._enemy_xywh,
+            self._evx,
+            self._evy,
+            self._edir,
+            self._ealive,
+            self.camera_x - margin,
+            self.camera_x + SCREEN_WIDTH + margin,
+            self._solids_xywh,
+            self._config["gravity"],
+            self._config["terminal_velocity"],
+            self._config["enemy_speed"],
+            dt,
+            SUBPIXEL_BITS,
+            SCREEN_HEIGHT + 400,
+        )
 
     def _check_enemy_collisions(self, prev_player_rect):
         player_rect = self._player_rect()
-        for enemy in self.chestnut_guys:
-            if not enemy["alive"]:
-                continue
-            enemy_rect = pygame.Rect(
-                int(enemy["x"]), int(enemy["y"]), int(enemy["w"]), int(enemy["h"])
-            )
-            if not player_rect.colliderect(enemy_rect):
-                continue
-
-            stomp = self.player["vy"] > 0.0 and prev_player_rect.bottom <= enemy_rect.top + 6
+        if not _any_overlap(player_rect, self._enemy_xywh):
+            return
+        hits = self._ealive & _overlaps(player_rect, self._enemy_xywh)
+        for i in np.flatnonzero(hits):
+            enemy_rect = self._enemy_rect(i)
+            stomp = self.player.vy > 0.0 and prev_player_rect.bottom <= enemy_rect.top + 6
             if stomp:
-                enemy["alive"] = False
-                self.player["vy"] = -self._config["stomp_bounce"]
+                self._ealive[i] = False
+                self.player.vy = -self._config["stomp_bounce"]
                 self.score += 100
                 self._play_sfx("stomp")
             else:
@@ -465,15 +585,19 @@ class Game:
         player_rect = self._player_rect()
         if player_rect.centerx < enemy_rect.centerx:
             knock_dir = -1.0
-            self.player["x"] = float(enemy_rect.left - player_rect.w - 2)
+            self.player.xq = (enemy_rect.left - player_rect.w - 2) << SUBPIXEL_BITS
         else:
             knock_dir = 1.0
-            self.player["x"] = float(enemy_rect.right + 2)
+            self.player.xq = (enemy_rect.right + 2) << SUBPIXEL_BITS
+
+        self.player.vx = knock_dir * self._config["max_speed"] * 0.9
+        self.player.vy = -self._config["jump_speed"] * 0.55
+        self.player.on_ground = False
+        self._clamp_player_x()
 
-        self.player["vx"] = knock_dir * self._config["max_speed"] * 0.9
-        self.player["vy"] = -self._config["jump_speed"] * 0.55
-        self.player["on_ground"] = False
-        self.player["x"] = max(0.0, min(float(self.world_width - player_rect.w), self.player["x"]))
+    def _clamp_player_x(self):
+        max_xq = (self.world_width - self.player.w) << SUBPIXEL_BITS
+        self.player.xq = max(0, min(max_xq, self.player.xq))
 
     def _check_goal(self):
         if self.state != "playing":
@@ -486,7 +610,7 @@ class Game:
     def _check_fall_off_world(self):
         if self.state != "playing":
             return
-        if self.player["y"] > SCREEN_HEIGHT + 400:
+        if _to_pixels(self.player.yq) > SCREEN_HEIGHT + 400:
             self._lose_life_and_respawn()
 
     def _lose_life_and_respawn(self):
@@ -496,12 +620,12 @@ class Game:
             return
         self.powered_up = False
         self.invincible_s = 0.0
-        self.player["x"] = float(self.spawn.x)
-        self.player["y"] = float(self.spawn.y)
-        self.player["vx"] = 0.0
-        self.player["vy"] = 0.0
-        self.player["on_ground"] = False
+        self.player.xq = int(self.spawn.x) << SUBPIXEL_BITS
+        self.player.yq = int(self.spawn.y) << SUBPIXEL_BITS
+        self.player.vx = 0.0
+        self.player.vy = 0.0
+        self.player.on_ground = False
 
     def _update_camera(self):
-        target = self.player["x"] + self.player["w"] * 0.5 - SCREEN_WIDTH * 0.5
-        self.camera_x = max(0.0, min(float(self.world_width - SCREEN_WIDTH), target))
+        target = _to_pixels(self.player.xq) + self.player.w // 2 - SCREEN_WIDTH // 2
+        self.camera_x = max(0, min(self.world_width - SCREEN_WIDTH, target))
@@ -1,28 +1,49 @@
 import argparse
 import math
-from array import array
 
+import numpy as np
 import pygame
 
 from game import Game, SCREEN_HEIGHT, SCREEN_WIDTH
 from sprites import Sprites
 
+_K_LEFT, _K_RIGHT, _K_A, _K_D = pygame.K_LEFT, pygame.K_RIGHT, pygame.K_a, pygame.K_d
+_JUMP_KEYS = frozenset((pygame.K_SPACE, pygame.K_w, pygame.K_UP))
+# Events after which the window contents may be stale and need a full repaint.
+_REDRAW_EVENTS = frozenset((pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED, pygame.VIDEOEXPOSE))
+# Loop rate on the win/game-over screen while no input arrives.
+IDLE_FPS = 10
+
 
 def make_beep(freq_hz, duration_s, volume=0.4, sample_rate=44100):
     length = int(sample_rate * duration_s)
     amplitude = int(32767 * max(0.0, min(volume, 1.0)))
-    buf = array("h")
-    for i in range(length):
-        t = i / sample_rate
-        value = int(amplitude * math.sin(2 * math.pi * freq_hz * t))
-        buf.append(value)
-    return pygame.mixer.Sound(buffer=buf.tobytes())
+    t = np.arange(length) / sample_rate
+    samples = (amplitude * np.sin(2 * math.pi * freq_hz * t)).astype(np.int16)
+    return _make_sound(samples)
+
+
+def _make_sound(samples):
+    # sndarray wants one column per mixer channel; the mixer is pre_init'ed mono,
+    # but a driver may still hand back a stereo device.
+    channels = pygame.mixer.get_init()[2]
+    if channels > 1:
+        samples = np.repeat(samples[:, None], channels, axis=1)
+    return pygame.sndarray.make_sound(np.ascontiguousarray(samples, dtype=np.int16))
 
 
 def _midi_to_freq_hz(midi_note):
     return 440.0 * (2.0 ** ((midi_note - 69) / 12))
 
 
+def _square_wave(phase, inc, length):
+    # 32-bit phase accumulator; returns the +/-1 wave and the phase after the last sample.
+    if not inc or not length:
+        return np.zeros(length, dtype=np.int32), phase
+    phases = (phase + inc * np.arange(1, length + 1, dtype=np.uint64)) & 0xFFFFFFFF
+    return np.where(phases < 0x80000000, 1, -1), int(phases[-1])
+
+
 def make_music_loop(volume=0.18, tempo_bpm=120, sample_rate=44100):
     step_duration = 60.0 / float(tempo_bpm) / 2.0
     melody = [
@@ -39,16 +60,20 @@ def make_music_loop(volume=0.18, tempo_bpm=120, sample_rate=44100):
     ]
 
     fade_len = 256
-    fade_curve = [i for i in range(fade_len)]
     max_amp = int(32767 * max(0.0, min(volume, 1.0)) * 0.5)
     phase_mel = 0
     phase_bass = 0
-    buf = array("h")
 
-    for melody_note, bass_note in zip(melody, bass):
-        seg_len = int(sample_rate * step_duration)
-        seg_fade = min(fade_len, max(0, seg_len // 2))
+    seg_len = int(sample_rate * step_duration)
+    seg_fade = min(fade_len, max(0, seg_len // 2))
+    envelope = np.full(seg_len, max_amp, dtype=np.int64)
+    if seg_fade:
+        ramp = max_amp * np.arange(seg_fade, dtype=np.int64) // seg_fade
+        envelope[:seg_fade] = ramp
+        envelope[seg_len - seg_fade :] = ramp[::-1]
 
+    segments = []
+    for melody_note, bass_note in zip(melody, bass):
         inc_mel = (
             int(_midi_to_freq_hz(melody_note) * (1 << 32) / sample_rate)
             if melody_note
@@ -58,25 +83,12 @@ def make_music_loop(volume=0.18, tempo_bpm=120, sample_rate=44100):
             int(_midi_to_freq_hz(bass_note) * (1 << 32) / sample_rate) if bass_note else 0
         )
 
-        for i in range(seg_len):
-            sample = 0
-            if inc_bass:
-                phase_bass = (phase_bass + inc_bass) & 0xFFFFFFFF
-                sample += 1 if phase_bass < 0x80000000 else -1
-            if inc_mel:
-                phase_mel = (phase_mel + inc_mel) & 0xFFFFFFFF
-                sample += 1 if phase_mel < 0x80000000 else -1
-
-            amp = max_amp
-            if seg_fade:
-                if i < seg_fade:
-                    amp = max_amp * fade_curve[i] // seg_fade
-                elif i >= seg_len - seg_fade:
-                    amp = max_amp * fade_curve[seg_len - i - 1] // seg_fade
+        bass_wave, phase_bass = _square_wave(phase_bass, inc_bass, seg_len)
+        mel_wave, phase_mel = _square_wave(phase_mel, inc_mel, seg_len)
+        segments.append((bass_wave + mel_wave) * envelope)
 
-            buf.append(int(sample * amp))
-
-    return pygame.mixer.Sound(buffer=buf.tobytes())
+    samples = np.concatenate(segments).astype(np.int16)
+    return _make_sound(samples)
 
 
 def init_audio():
@@ -114,8 +126,8 @@ def parse_args():
 
 def read_player_input(jump_pressed):
     keys = pygame.key.get_pressed()
-    left = keys[pygame.K_LEFT] or keys[pygame.K_a]
-    right = keys[pygame.K_RIGHT] or keys[pygame.K_d]
+    left = keys[_K_LEFT] | keys[_K_A]
+    right = keys[_K_RIGHT] | keys[_K_D]
     if left and right:
         left = right = False
     jump = bool(jump_pressed)
@@ -151,15 +163,18 @@ def main():
     running = True
     while running:
         jump_pressed = False
-        for event in pygame.event.get():
+        events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type in _REDRAW_EVENTS:
+                game.invalidate()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     running = False
                 if event.key == pygame.K_r and game.state != "playing":
                     game = Game(sfx=sfx, sprites=sprites)
-                if event.key in {pygame.K_SPACE, pygame.K_w, pygame.K_UP}:
+                if event.key in _JUMP_KEYS:
                     jump_pressed = True
                 if event.key == pygame.K_m and music_channel:
                     if music_paused:
@@ -168,11 +183,18 @@ def main():
                         music_channel.pause()
                     music_paused = not music_paused
 
+        # Once the level is over nothing moves until a key is pressed, so keep
+        # the last frame on screen and poll slowly.
+        if game.state != "playing" and not events:
+            clock.tick(IDLE_FPS)
+            continue
+
+        ticks = pygame.time.get_ticks()
         action = read_player_input(jump_pressed)
-        game.update(action)
+        game.update(action, ticks)
 
-        game.draw(screen, fonts)
-        pygame.display.flip()
+        dirty = game.draw(screen, fonts, ticks)
+        pygame.display.update(dirty)
         clock.tick(args.fps)
 
     pygame.quit()
@@ -0,0 +1,114 @@
+import math
+
+from numba import njit
+
+
+@njit(cache=True)
+def _to_pixels(q, subpixel_bits):
+    # Truncate toward zero, as int() did on the old float positions.
+    if q >= 0:
+        return q >> subpixel_bits
+    return -(-q >> subpixel_bits)
+
+
+@njit(cache=True)
+def overlaps(x, y, w, h, xywh):
+    return (
+        (x < xywh[:, 0] + xywh[:, 2])
+        & (x + w > xywh[:, 0])
+        & (y < xywh[:, 1] + xywh[:, 3])
+        & (y + h > xywh[:, 1])
+    )
+
+
+@njit(cache=True)
+def any_overlap(x, y, w, h, xywh):
+    # Scalar test that stops at the first hit; no mask is allocated.
+    for j in range(xywh.shape[0]):
+        if (
+            x < xywh[j, 0] + xywh[j, 2]
+            and x + w > xywh[j, 0]
+            and y < xywh[j, 1] + xywh[j, 3]
+            and y + h > xywh[j, 1]
+        ):
+            return True
+    return False
+
+
+@njit(cache=True)
+def step_enemies(
+    ex,
+    ey,
+    xywh,
+    evx,
+    evy,
+    edir,
+    ealive,
+    active_x0,
+    active_x1,
+    solids,
+    gravity,
+    terminal,
+    speed,
+    dt,
+    subpixel_bits,
+    kill_y,
+):
+    # ex/ey are fixed-point; the sweeps use the same integer rect math as
+    # pygame.Rect: push out along one axis at a time, compare centers with
+    # floor division, then snap back to whole pixels. xywh holds each enemy's
+    # pixel box and is kept in sync in place. Enemies whose box lies outside
+    # [active_x0, active_x1] hold still.
+    scale = 1 << subpixel_bits
+    for i in range(ex.shape[0]):
+        if not ealive[i] or xywh[i, 0] + xywh[i, 2] < active_x0 or xywh[i, 0] > active_x1:
+            continue
+
+        vy = min(terminal, evy[i] + gravity * dt)
+        direction = edir[i]
+        vx = speed * direction
+        w = int(xywh[i, 2])
+        h = int(xywh[i, 3])
+
+        x = _to_pixels(ex[i] + math.floor(vx * dt * scale), subpixel_bits)
+        y = _to_pixels(ey[i], subpixel_bits)
+        hit_wall = False
+        for j in range(solids.shape[0]):
+            sx, sy, sw, sh = solids[j, 0], solids[j, 1], solids[j, 2], solids[j, 3]
+            if x < sx + sw and x + w > sx and y < sy + sh and y + h > sy:
+                hit_wall = True
+                if x + w // 2 > sx + sw // 2:
+                    x = sx + sw
+                else:
+                    x = sx - w
+                vx = 0.0
+
+        y = _to_pixels(ey[i] + math.floor(vy * dt * scale), subpixel_bits)
+        on_ground = False
+        for j in range(solids.shape[0]):
+            sx, sy, sw, sh = solids[j, 0], solids[j, 1], solids[j, 2], solids[j, 3]
+            if x < sx + sw and x + w > sx and y < sy + sh and y + h > sy:
+                vy = 0.0
+                if y + h // 2 > sy + sh // 2:
+                    y = sy + sh
+                else:
+                    y = sy - h
+                    on_ground = True
+
+        if hit_wall:
+            direction = -direction
+
+        if on_ground:
+            foot_x = x + w + 2 if direction > 0 else x - 2
+            if not any_overlap(foot_x, y + h + 2, 2, 6, solids):
+                direction = -direction
+
+        ex[i] = x << subpixel_bits
+        ey[i] = y << subpixel_bits
+        xywh[i, 0] = x
+        xywh[i, 1] = y
+        evx[i] = vx
+        evy[i] = vy
+        edir[i] = direction
+        if y > kill_y:
+            ealive[i] = False
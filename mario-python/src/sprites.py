@@ -1,264 +1,375 @@
+import functools
+
+import numpy as np
 import pygame
 
+_IS_CE = hasattr(pygame, "IS_CE")
+# Palette color behind the colorkey; no sprite draws with it.
+_KEY_RGB = (255, 0, 255)
+
+# Player poses, in the order of _PLAYER_CHARS.
+POSE_IDLE = 0
+POSE_WALK = 1  # two frames: POSE_WALK and POSE_WALK + 1
+POSE_JUMP = 3
+
 
-def _scale2x(surface, scale):
+def _upscale(pixels, scale):
+    # Nearest-neighbour integer upscale of a pixel array, before any Surface exists.
     if scale == 1:
-        return surface
-    return pygame.transform.scale(surface, (surface.get_width() * scale, surface.get_height() * scale))
+        return pixels
+    return pixels.repeat(scale, axis=0).repeat(scale, axis=1)
 
 
-def _pixel_sprite(pattern, palette, scale=1):
+def _pattern_chars(pattern):
     if not pattern:
         raise ValueError("pattern is empty")
     width = len(pattern[0])
     if any(len(row) != width for row in pattern):
         raise ValueError("pattern rows must be the same width")
-
-    surface = pygame.Surface((width, len(pattern)), pygame.SRCALPHA)
-    for y, row in enumerate(pattern):
-        for x, ch in enumerate(row):
-            if ch == ".":
-                continue
-            color = palette.get(ch)
-            if color is None:
-                continue
-            surface.set_at((x, y), color)
-    surface = _scale2x(surface, scale)
-    try:
-        surface = surface.convert_alpha()
-    except pygame.error:
-        pass
+    chars = np.frombuffer("".join(pattern).encode("ascii"), dtype=np.uint8)
+    return chars.reshape(len(pattern), width)
+
+
+def _palette_lut(palette):
+    # One RGBA row per byte value; "." and unknown characters stay transparent.
+    lut = np.zeros((256, 4), dtype=np.uint8)
+    for ch, color in palette.items():
+        if ch != ".":
+            lut[ord(ch)] = tuple(pygame.Color(color))
+    return lut
+
+
+def _rgba_surface(rgba):
+    # tobytes() lays out strided views (e.g. flips) in row order as well.
+    height, width = rgba.shape[:2]
+    return pygame.image.frombuffer(rgba.tobytes(), (width, height), "RGBA")
+
+
+def _chars_sprite(chars, lut, scale=1):
+    # 8-bit surface whose pixels are the chars themselves and whose palette is
+    # the LUT; transparent chars all become index 0, the colorkey.
+    indexes = _upscale(np.where(lut[chars, 3] == 0, 0, chars).astype(np.uint8), scale)
+    height, width = indexes.shape
+    surface = pygame.image.frombuffer(indexes.tobytes(), (width, height), "P")
+    palette = lut[:, :3].copy()
+    palette[0] = _KEY_RGB
+    surface.set_palette([tuple(rgb) for rgb in palette])
+    surface.set_colorkey(0)
     return surface
 
 
-def blit_tiled(dest, tile, rect):
+def _pixel_sprite(pattern, palette, scale=1):
+    return _chars_sprite(_pattern_chars(pattern), _palette_lut(palette), scale)
+
+
+# Player patterns, shared by every form; "r" and "b" are recolored per form.
+_PLAYER_IDLE = (
+    "....rrr....",
+    "...rrrrr...",
+    "...rkkkr...",
+    "..ksswssk..",
+    "..ksssssk..",
+    "..krrrrrk..",
+    "..krryrrk..",
+    "..kbbbbbk..",
+    "..kbbbbbbk.",
+    "..kbbbbbbk.",
+    "..kb...bk..",
+    "..kn...nk..",
+    "...nn.nn...",
+    "...........",
+)
+
+_PLAYER_WALK1 = (
+    "....rrr....",
+    "...rrrrr...",
+    "...rkkkr...",
+    "..ksswssk..",
+    "..ksssssk..",
+    "..krrrrrk..",
+    "..krryrrk..",
+    "..kbbbbbk..",
+    "..kbbbbbbk.",
+    ".kbbb..bbk.",
+    "..kb...bk..",
+    "..kn...nk..",
+    "...nn.nn...",
+    "...........",
+)
+
+_PLAYER_WALK2 = (
+    "....rrr....",
+    "...rrrrr...",
+    "...rkkkr...",
+    "..ksswssk..",
+    "..ksssssk..",
+    "..krrrrrk..",
+    "..krryrrk..",
+    "..kbbbbbk..",
+    "..kbbbbbbk.",
+    ".kbb..bbbk.",
+    "..kb...bk..",
+    "..kn...nk..",
+    "...nn.nn...",
+    "...........",
+)
+
+_PLAYER_JUMP = (
+    "....rrr....",
+    "...rrrrr...",
+    "...rkkkr...",
+    "..ksswssk..",
+    "..ksssssk..",
+    "..krrrrrk..",
+    "..krryrrk..",
+    "..kbbbbbk..",
+    "..kbbbbbbk.",
+    ".kbbb..bbk.",
+    "..kbbbbbk..",
+    "...knnnk...",
+    "....nnn....",
+    "...........",
+)
+
+_PLAYER_CHARS = tuple(
+    _pattern_chars(pattern)
+    for pattern in (_PLAYER_IDLE, _PLAYER_WALK1, _PLAYER_WALK2, _PLAYER_JUMP)
+)
+_PLAYER_LUT = _palette_lut(
+    {
+        "k": (24, 24, 30),
+        "s": (245, 218, 188),
+        "w": (255, 255, 255),
+        "y": (250, 215, 70),
+        "n": (38, 38, 45),
+    }
+)
+
+_COIN_LUT = _palette_lut(
+    {
+        "c": (250, 215, 70),
+        "k": (140, 110, 20),
+        "h": (255, 245, 180),
+    }
+)
+
+
+# Pole-top knob; matches pygame.draw.circle(radius=4) at the pole's center.
+_POLE_CAP = (
+    "...##...",
+    ".######.",
+    ".######.",
+    "########",
+    "########",
+    ".######.",
+    ".######.",
+    "...##...",
+)
+
+
+def _flag_mask(h, w, pole_x, top, bottom, tip):
+    # Triangle with a vertical edge at pole_x from top to bottom, pointing at tip.
+    # The row spans follow pygame.draw.polygon: edge crossings floor toward the tip.
+    tip_x, tip_y = tip
+    ys = np.arange(h)
+    upper = pole_x + (ys - top) * (tip_x - pole_x) // (tip_y - top)
+    lower = tip_x + (ys - tip_y) * (pole_x - tip_x) // (bottom - tip_y)
+    left = np.where(ys < tip_y, upper, lower)
+    xs = np.arange(w)
+    rows = (ys >= top) & (ys <= bottom)
+    return rows[:, None] & (xs >= left[:, None]) & (xs <= pole_x)
+
+
+def _ellipse_mask(h, w, ellipse_w, ellipse_h):
+    # Centered ellipse; the radii are fitted to match pygame.draw.ellipse pixels.
+    ys, xs = np.ogrid[:h, :w]
+    rx = (ellipse_w + 0.4) / 2
+    ry = (ellipse_h - 0.5) / 2
+    return ((xs - w // 2) / rx) ** 2 + ((ys - h // 2) / ry) ** 2 <= 1
+
+
+def _mask_edge(mask, diagonal):
+    # Pixels of mask with an unset neighbour: the mask minus its erosion.
+    h, w = mask.shape
+    padded = np.pad(mask, 1)
+    inner = mask.copy()
+    for dy in range(3):
+        for dx in range(3):
+            if diagonal or dy == 1 or dx == 1:
+                inner &= padded[dy : dy + h, dx : dx + w]
+    return mask & ~inner
+
+
+def _coin_chars():
+    # One char grid per spin frame, stacked; body, rim and highlight are masks.
+    widths = (9, 7, 5, 7)
+    chars = np.full((len(widths), 9, 9), ord("."), dtype=np.uint8)
+    for frame, width in zip(chars, widths):
+        body = _ellipse_mask(9, 9, width, 9)
+        frame[body] = ord("c")
+        frame[_mask_edge(body, diagonal=True)] = ord("k")
+        frame[_mask_edge(_ellipse_mask(9, 9, width - 2, 7), diagonal=False)] = ord("h")
+    return chars
+
+
+_COIN_CHARS = _coin_chars()
+
+
+def _tile_blits(tile, x, y, w, h):
+    # (source, dest, area) items for Surface.blits that tile the given box.
     tile_w, tile_h = tile.get_size()
     if tile_w <= 0 or tile_h <= 0:
+        return []
+    right = x + w
+    bottom = y + h
+    return [
+        (tile, (tx, ty), (0, 0, min(tile_w, right - tx), min(tile_h, bottom - ty)))
+        for ty in range(y, bottom, tile_h)
+        for tx in range(x, right, tile_w)
+    ]
+
+
+def blit_tiled(dest, tile, rect):
+    # Tile one row into a strip, then stamp the strip once per row.
+    tile_w, tile_h = tile.get_size()
+    if rect.w <= 0 or rect.h <= 0 or tile_w <= 0 or tile_h <= 0:
         return
-    for y in range(rect.top, rect.bottom, tile_h):
-        for x in range(rect.left, rect.right, tile_w):
-            w = min(tile_w, rect.right - x)
-            h = min(tile_h, rect.bottom - y)
-            if w <= 0 or h <= 0:
-                continue
-            dest.blit(tile, (x, y), area=pygame.Rect(0, 0, w, h))
+    strip = pygame.Surface((rect.w, tile_h), pygame.SRCALPHA)
+    # RGBA_MAX onto the cleared strip copies the tile pixels without blending.
+    strip.blit(tile, (0, 0), None, pygame.BLEND_RGBA_MAX)
+    # Copy the filled part after itself, doubling it until the strip is full.
+    filled = tile_w
+    while filled < rect.w:
+        strip.blit(strip, (filled, 0), (0, 0, filled, tile_h), pygame.BLEND_RGBA_MAX)
+        filled *= 2
+    rows = _tile_blits(strip, rect.x, rect.y, rect.w, rect.h)
+    if _IS_CE:
+        # fblits takes no area, so only the last row can be cut short.
+        *full, last = rows
+        dest.fblits([(source, pos) for source, pos, _ in full])
+        dest.blit(*last)
+    else:
+        dest.blits(rows, doreturn=False)
 
 
 class Sprites:
+    __slots__ = (
+        "scale",
+        "ground_tile",
+        "coin_frames",
+        "goal",
+        "mushroom",
+        "player_frames",
+        "enemy_frames",
+        "_has_display",
+    )
+
     def __init__(self, scale=2):
-        self.scale = scale
+        """Build every sprite surface.
+
+        Create this after pygame.display.set_mode(): each surface is converted
+        to the display's pixel format so per-frame blits skip format
+        conversion. Without a display the surfaces stay unconverted.
 
+        Surfaces depend only on scale and on whether a display exists, and are
+        never drawn into, so they are built once per (scale, display) pair and
+        shared by every later Sprites(scale).
+        """
+        self.scale = scale
+        built = _built_sprites(scale, pygame.display.get_surface() is not None)
+        self.ground_tile = built.ground_tile
+        self.coin_frames = built.coin_frames
+        self.goal = built.goal
+        self.mushroom = built.mushroom
+        self.player_frames = built.player_frames
+        self.enemy_frames = built.enemy_frames
+        self._has_display = built._has_display
+
+    def _build(self):
         self.ground_tile = self._make_ground_tile()
         self.coin_frames = self._make_coin_frames()
         self.goal = self._make_goal_sprite()
         self.mushroom = self._make_mushroom_sprite()
 
-        self.player = {
-            "normal": self._make_player_form(outfit_rgb=(220, 50, 60), overalls_rgb=(35, 70, 200)),
-            "powered": self._make_player_form(outfit_rgb=(65, 205, 95), overalls_rgb=(30, 150, 70)),
-        }
-
-        enemy_right = self._make_enemy_frames()
-        self.enemy = [
-            {
-                "right": enemy_right[0],
-                "left": pygame.transform.flip(enemy_right[0], True, False),
-            },
-            {
-                "right": enemy_right[1],
-                "left": pygame.transform.flip(enemy_right[1], True, False),
-            },
-        ]
+        # Indexed by player_index() / enemy_index(), so drawing is one tuple lookup.
+        self.player_frames = self._make_player_form(
+            outfit_rgb=(220, 50, 60), overalls_rgb=(35, 70, 200)
+        ) + self._make_player_form(outfit_rgb=(65, 205, 95), overalls_rgb=(30, 150, 70))
+
+        self.enemy_frames = self._make_enemy_frames()
+
+    @staticmethod
+    def player_index(powered, left, pose):
+        return (powered << 3) | (left << 2) | pose
+
+    @staticmethod
+    def enemy_index(left, frame):
+        return (left << 1) | frame
+
+    def _finalize(self, surface):
+        if not self._has_display:
+            return surface
+        if surface.get_colorkey() is None:
+            return surface.convert_alpha()
+        # Keyed sprites have no partial alpha: a plain RLE colorkey blit beats blending.
+        surface = surface.convert()
+        surface.set_colorkey(surface.get_colorkey(), pygame.RLEACCEL)
+        return surface
 
     def _make_player_form(self, outfit_rgb, overalls_rgb):
-        right = self._make_player_frames(outfit_rgb=outfit_rgb, overalls_rgb=overalls_rgb)
-        return {
-            "idle": {
-                "right": right["idle"],
-                "left": pygame.transform.flip(right["idle"], True, False),
-            },
-            "walk": [
-                {
-                    "right": right["walk"][0],
-                    "left": pygame.transform.flip(right["walk"][0], True, False),
-                },
-                {
-                    "right": right["walk"][1],
-                    "left": pygame.transform.flip(right["walk"][1], True, False),
-                },
-            ],
-            "jump": {
-                "right": right["jump"],
-                "left": pygame.transform.flip(right["jump"], True, False),
-            },
-        }
+        # The two forms share patterns and differ only in the "r" and "b" colors.
+        lut = _PLAYER_LUT.copy()
+        lut[ord("r")] = tuple(pygame.Color(outfit_rgb))
+        lut[ord("b")] = tuple(pygame.Color(overalls_rgb))
+        # Left-facing frames are the same chars read back to front along x.
+        left = [chars[:, ::-1] for chars in _PLAYER_CHARS]
+        return tuple(
+            self._finalize(_chars_sprite(chars, lut, self.scale))
+            for chars in _PLAYER_CHARS + tuple(left)
+        )
 
     def _make_ground_tile(self):
-        base = pygame.Surface((20, 20), pygame.SRCALPHA)
-        dirt = (115, 70, 35)
-        dirt_dark = (92, 56, 28)
-        grass = (70, 200, 90)
-        grass_dark = (55, 165, 72)
-        stone = (150, 145, 140)
-
-        base.fill(dirt)
-        pygame.draw.rect(base, grass, pygame.Rect(0, 0, 20, 6))
-        for x in range(0, 20, 2):
-            base.set_at((x, 5), grass_dark)
-
-        for x, y in [
-            (3, 9),
-            (7, 12),
-            (13, 10),
-            (16, 15),
-            (10, 17),
-        ]:
-            base.set_at((x, y), dirt_dark)
-
-        pygame.draw.rect(base, stone, pygame.Rect(14, 11, 3, 3))
-        pygame.draw.rect(base, (110, 105, 102), pygame.Rect(15, 12, 1, 1))
-
-        tile = _scale2x(base, self.scale)
-        try:
-            tile = tile.convert_alpha()
-        except pygame.error:
-            pass
-        return tile
+        base = np.empty((20, 20, 4), dtype=np.uint8)
+        dirt = (115, 70, 35, 255)
+        dirt_dark = (92, 56, 28, 255)
+        grass = (70, 200, 90, 255)
+        grass_dark = (55, 165, 72, 255)
+        stone = (150, 145, 140, 255)
+
+        base[:] = dirt
+        base[:6] = grass
+        base[5, 0::2] = grass_dark
+        # Dark dirt specks, given as (rows, columns).
+        base[(9, 12, 10, 15, 17), (3, 7, 13, 16, 10)] = dirt_dark
+        base[11:14, 14:17] = stone
+        base[12, 15] = (110, 105, 102, 255)
+
+        return self._finalize(_rgba_surface(_upscale(base, self.scale)))
 
     def _make_coin_frames(self):
-        frames = []
-        for width in (9, 7, 5, 7):
-            base = pygame.Surface((9, 9), pygame.SRCALPHA)
-            rect = pygame.Rect(0, 0, width, 9)
-            rect.center = (4, 4)
-            pygame.draw.ellipse(base, (250, 215, 70), rect)
-            pygame.draw.ellipse(base, (140, 110, 20), rect, width=1)
-            highlight = pygame.Rect(rect.x + 1, rect.y + 1, max(1, rect.w - 2), max(1, rect.h - 2))
-            pygame.draw.ellipse(base, (255, 245, 180), highlight, width=1)
-            frame = _scale2x(base, self.scale)
-            try:
-                frame = frame.convert_alpha()
-            except pygame.error:
-                pass
-            frames.append(frame)
-        return frames
+        return [self._finalize(_chars_sprite(frame, _COIN_LUT, self.scale)) for frame in _COIN_CHARS]
 
     def _make_goal_sprite(self):
         w, h = 20, 140
-        surf = pygame.Surface((w, h), pygame.SRCALPHA)
-        pole = (245, 245, 245)
-        pole_shadow = (195, 195, 195)
-        flag = (220, 50, 60)
-        flag_shadow = (160, 30, 38)
-
-        pygame.draw.rect(surf, pole_shadow, pygame.Rect(10, 0, 4, h))
-        pygame.draw.rect(surf, pole, pygame.Rect(9, 0, 4, h))
-        pygame.draw.circle(surf, pole, (11, 4), 4)
-
-        pygame.draw.polygon(
-            surf,
-            flag_shadow,
-            [(11, 10), (11, 38), (2, 32)],
-        )
-        pygame.draw.polygon(
-            surf,
-            flag,
-            [(10, 10), (10, 38), (1, 32)],
-        )
-        pygame.draw.rect(surf, (250, 215, 70), pygame.Rect(3, h - 10, 14, 6), border_radius=2)
-        try:
-            surf = surf.convert_alpha()
-        except pygame.error:
-            pass
-        return surf
-
-    def _make_player_frames(self, outfit_rgb, overalls_rgb):
-        palette = {
-            "k": (24, 24, 30),
-            "r": outfit_rgb,
-            "b": overalls_rgb,
-            "s": (245, 218, 188),
-            "w": (255, 255, 255),
-            "y": (250, 215, 70),
-            "n": (38, 38, 45),
-        }
-
-        idle = [
-            "....rrr....",
-            "...rrrrr...",
-            "...rkkkr...",
-            "..ksswssk..",
-            "..ksssssk..",
-            "..krrrrrk..",
-            "..krryrrk..",
-            "..kbbbbbk..",
-            "..kbbbbbbk.",
-            "..kbbbbbbk.",
-            "..kb...bk..",
-            "..kn...nk..",
-            "...nn.nn...",
-            "...........",
-        ]
-
-        walk1 = [
-            "....rrr....",
-            "...rrrrr...",
-            "...rkkkr...",
-            "..ksswssk..",
-            "..ksssssk..",
-            "..krrrrrk..",
-            "..krryrrk..",
-            "..kbbbbbk..",
-            "..kbbbbbbk.",
-            ".kbbb..bbk.",
-            "..kb...bk..",
-            "..kn...nk..",
-            "...nn.nn...",
-            "...........",
-        ]
-
-        walk2 = [
-            "....rrr....",
-            "...rrrrr...",
-            "...rkkkr...",
-            "..ksswssk..",
-            "..ksssssk..",
-            "..krrrrrk..",
-            "..krryrrk..",
-            "..kbbbbbk..",
-            "..kbbbbbbk.",
-            ".kbb..bbbk.",
-            "..kb...bk..",
-            "..kn...nk..",
-            "...nn.nn...",
-            "...........",
-        ]
-
-        jump = [
-            "....rrr....",
-            "...rrrrr...",
-            "...rkkkr...",
-            "..ksswssk..",
-            "..ksssssk..",
-            "..krrrrrk..",
-            "..krryrrk..",
-            "..kbbbbbk..",
-            "..kbbbbbbk.",
-            ".kbbb..bbk.",
-            "..kbbbbb k..".replace(" ", ""),
-            "...knnnk...",
-            "....nnn....",
-            "...........",
-        ]
-
-        return {
-            "idle": _pixel_sprite(idle, palette, scale=self.scale),
-            "walk": [
-                _pixel_sprite(walk1, palette, scale=self.scale),
-                _pixel_sprite(walk2, palette, scale=self.scale),
-            ],
-            "jump": _pixel_sprite(jump, palette, scale=self.scale),
-        }
+        arr = np.zeros((h, w, 4), dtype=np.uint8)
+        pole = (245, 245, 245, 255)
+        pole_shadow = (195, 195, 195, 255)
+        flag = (220, 50, 60, 255)
+        flag_shadow = (160, 30, 38, 255)
+
+        arr[:, 10:14] = pole_shadow
+        arr[:, 9:13] = pole
+        arr[0:8, 7:15][_pattern_chars(_POLE_CAP) != ord(".")] = pole
+
+        flag_mask = _flag_mask(h, w, pole_x=11, top=10, bottom=38, tip=(2, 32))
+        arr[flag_mask] = flag_shadow
+        arr[:, :-1][flag_mask[:, 1:]] = flag
+
+        # Plaque with its corner pixels rounded off.
+        plaque = np.ones((6, 14), dtype=bool)
+        plaque[::5, ::13] = False
+        arr[h - 10 : h - 4, 3:17][plaque] = (250, 215, 70, 255)
+        return self._finalize(_rgba_surface(arr))
 
     def _make_mushroom_sprite(self):
         palette = {
@@ -281,35 +392,43 @@ class Sprites:
             "..kdddddk..",
             "...kkkkk...",
         ]
-        surface = _pixel_sprite(pattern, palette, scale=self.scale)
-        return surface
+        return self._finalize(_pixel_sprite(pattern, palette, scale=self.scale))
 
     def _make_enemy_frames(self):
-        def frame(feet_offset):
-            base = pygame.Surface((12, 10), pygame.SRCALPHA)
-            body = (160, 100, 48)
-            outline = (70, 40, 18)
-            eye = (255, 255, 255)
-            pupil = (24, 24, 30)
-            cheek = (205, 120, 60)
-
-            pygame.draw.ellipse(base, body, pygame.Rect(0, 1, 12, 8))
-            pygame.draw.ellipse(base, outline, pygame.Rect(0, 1, 12, 8), width=1)
-            pygame.draw.circle(base, eye, (4, 4), 2)
-            pygame.draw.circle(base, eye, (8, 4), 2)
-            pygame.draw.circle(base, pupil, (4, 4), 1)
-            pygame.draw.circle(base, pupil, (8, 4), 1)
-            pygame.draw.circle(base, cheek, (2, 6), 1)
-            pygame.draw.circle(base, cheek, (10, 6), 1)
-
-            pygame.draw.rect(base, outline, pygame.Rect(3 + feet_offset, 9, 2, 1))
-            pygame.draw.rect(base, outline, pygame.Rect(7 - feet_offset, 9, 2, 1))
-            return _scale2x(base, self.scale)
-
-        frames = [frame(0), frame(1)]
-        for idx, surf in enumerate(frames):
-            try:
-                frames[idx] = surf.convert_alpha()
-            except pygame.error:
-                pass
-        return frames
+        palette = {
+            "b": (160, 100, 48),
+            "k": (70, 40, 18),
+            "w": (255, 255, 255),
+            "p": (24, 24, 30),
+            "c": (205, 120, 60),
+        }
+        body = [
+            "............",
+            "....kkkk....",
+            "..kwwbbwwk..",
+            ".kwppwwppwk.",
+            "kbwppwwppwbk",
+            "kccwwbbwwcck",
+            ".ccbbbbbbcc.",
+            "..kkbbbbkk..",
+            "....kkkk....",
+        ]
+        # The two walk frames differ only in where the feet are.
+        lut = _palette_lut(palette)
+        right = np.stack(
+            [_pattern_chars(body + [feet]) for feet in ("...kk..kk...", "....kkkk....")]
+        )
+        # Both left-facing frames come from one reversed-x view of the stack.
+        frames = np.concatenate((right, right[:, :, ::-1]))
+        return tuple(self._finalize(_chars_sprite(chars, lut, self.scale)) for chars in frames)
+
+
+@functools.lru_cache(maxsize=None)
+def _built_sprites(scale, has_display):
+    # has_display is part of the key so a build made before set_mode() is not
+    # handed out unconverted once a display exists.
+    sprites = Sprites.__new__(Sprites)
+    sprites.scale = scale
+    sprites._has_display = has_display
+    sprites._build()
+    return sprites